@@ -120,6 +120,13 @@ class ProcessImageForcedTask(lsst.pipe.base.CmdLineTask):
         refWcs = self.references.getWcs(dataRef)
         exposure = self.getExposure(dataRef)
         refCat = self.fetchReferences(dataRef, exposure)
+        if not isinstance(refCat, lsst.afw.table.SourceCatalog):
+            # fetchReferences is permitted to return any iterable of SourceRecords;
+            # accumulate into a contiguous SourceCatalog (not a Python list) since
+            # the measurement subtask needs len() and getChildren() on it.
+            catalog = lsst.afw.table.SourceCatalog(self.references.schema)
+            catalog.extend(refCat)
+            refCat = catalog
         measCat = self.measurement.generateMeasCat(exposure, refCat, refWcs,
                                                    idFactory=self.makeIdFactory(dataRef))
         self.log.info("Performing forced measurement on %s" % dataRef.dataId)
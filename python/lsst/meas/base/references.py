@@ -24,12 +24,60 @@
 Subtasks for creating the reference catalogs used in forced measurement.
 """
 
+import threading
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # The concurrent.futures module (or its "futures" backport) may not be
+    # installed; patch catalogs are then always read sequentially.
+    ThreadPoolExecutor = None
+
+import numpy
+
 import lsst.afw.geom
 import lsst.pex.config
 import lsst.pipe.base
 
+try:
+    from lsst.daf.persistence import NoResults
+except ImportError:
+    # Older daf_persistence versions report a missing dataset as a plain RuntimeError.
+    NoResults = RuntimeError
+
 __all__ = ("BaseReferencesTask", "CoaddSrcReferencesTask")
 
+# Cache of reference catalog schemas, keyed on (coaddName, datasetSuffix); schemas are
+# immutable for a given repository, so entries are never invalidated.  This saves a
+# butler round-trip per task construction when many tasks are built in one process.
+_schemaCache = {}
+_schemaCacheLock = threading.Lock()
+
+# Cache of deserialized skymaps keyed on (id(butler), coaddName).  A skyMap is
+# immutable and can be tens of MB, so load it once per process rather than once per
+# CCD.  Each entry stores (butler, skyMap): holding the butler keeps its id from
+# being recycled by a different butler, and the entry is cross-checked by identity
+# on lookup so a stale id can never hand back another repository's skyMap.
+_skyMapCache = {}
+_skyMapCacheLock = threading.Lock()
+
+# Cache of "x,y" patch dataId strings keyed on the patch index tuple, so repeated
+# fetches over the same patches don't re-format (and re-hash) the same string.
+_patchIndexStrCache = {}
+
+# Safety margin in tract pixels added to the patch-pruning bbox in fetchInBox:
+# the bbox is the hull of the region's four projected corners, which only
+# approximates the curved sky boundary.  Erring loose costs at most an extra
+# patch read; erring tight would silently drop sources.
+_TRACT_BBOX_MARGIN = 50.0
+
+def _patchIndexStr(index):
+    s = _patchIndexStrCache.get(index)
+    if s is None:
+        s = "%d,%d" % index
+        _patchIndexStrCache[index] = s
+    return s
+
 class BaseReferencesConfig(lsst.pex.config.Config):
     removePatchOverlaps = lsst.pex.config.Field(
         doc = "Only include reference sources for each patch that lie within the patch's inner bbox",
@@ -41,6 +89,20 @@ class BaseReferencesConfig(lsst.pex.config.Config):
         dtype = str,
         optional = True
     )
+    numPatchThreads = lsst.pex.config.Field(
+        doc = "Number of threads used to read patch catalogs in parallel in fetchInPatches; "
+              "1 disables threading (also requires the concurrent.futures module)",
+        dtype = int,
+        default = 1
+    )
+    linearizationPadding = lsst.pex.config.Field(
+        doc = "Minimum number of pixels to grow the bounding box by when filtering reference "
+              "sources in subset() with the local linear approximation to the Wcs; the box is "
+              "grown further by the linearization error measured at the box boundary.  May "
+              "admit a few extra sources just outside the box.",
+        dtype = float,
+        default = 5.0
+    )
 
 class BaseReferencesTask(lsst.pipe.base.Task):
     """!
@@ -138,18 +200,88 @@ class BaseReferencesTask(lsst.pipe.base.Task):
         used in implementing fetchInBox that may be of use to subclasses.
         """
         boxD = lsst.afw.geom.Box2D(bbox)
-        # We're passed an arbitrary iterable, but we need a catalog so we can iterate
-        # over parents and then children.
+        # Gather the input records (shallowly) so they can be sorted by parent ID,
+        # putting each parent's children in a contiguous run.
+        gathered = lsst.afw.table.SourceCatalog(self.schema)
+        if hasattr(sources, "__len__"):
+            gathered.reserve(len(sources))
+        gathered.extend(sources, deep=False)
+        gathered.sort(lsst.afw.table.SourceTable.getParentKey())
+        # sort() permutes the record pointers without moving record data, so the
+        # sorted catalog is generally not contiguous in memory; the whole-column
+        # reads below require contiguity, so rebuild the catalog in sorted order
+        # with a single deep copy.
         catalog = lsst.afw.table.SourceCatalog(self.schema)
-        catalog.extend(sources)
-        # catalog must be sorted by parent ID for lsst.afw.table.getChildren to work
-        catalog.sort(lsst.afw.table.SourceTable.getParentKey())
-        # Iterate over objects that have no parent.
-        for parent in catalog.getChildren(0):
-            pixel = wcs.skyToPixel(parent.getCoord())
-            if boxD.contains(pixel):
+        catalog.reserve(len(gathered))
+        catalog.extend(gathered, deep=True)
+        # One linear scan over the sorted parent column gives every parent's child
+        # range, replacing a binary search plus view allocation per parent in
+        # getChildren.
+        if len(catalog) > 0:
+            parentIds = catalog["parent"]
+            uniqueIds, starts = numpy.unique(parentIds, return_index=True)
+            ends = numpy.append(starts[1:], len(catalog))
+            childRanges = dict((int(u), (int(i), int(j)))
+                               for u, i, j in zip(uniqueIds, starts, ends))
+        else:
+            childRanges = {}
+        # Convert all parent positions in one batch up front; only parents need
+        # converting, as children stand or fall with their parent.  The sort has put
+        # the parents (parent == 0) at the front of the catalog, so their coordinates
+        # are plain column slices rather than per-record getter calls, and no
+        # getChildren(0) view of the parents needs to be allocated.
+        firstParent, lastParent = childRanges.get(0, (0, 0))
+        ra = catalog["coord_ra"][firstParent:lastParent]
+        dec = catalog["coord_dec"][firstParent:lastParent]
+        # Over a single bbox the Wcs is very nearly linear, so instead of evaluating
+        # the full projection per parent, apply the local linearization at the box
+        # centre to the whole coordinate block at once and grow the box to absorb
+        # the approximation error; the contract only requires the returned set to be
+        # complete and *close* to minimal.
+        center = boxD.getCenter()
+        skyCenter = wcs.pixelToSky(center)
+        matrix = wcs.linearizeSkyToPixel(skyCenter, lsst.afw.geom.radians).getLinear().getMatrix()
+        centerRa = skyCenter.getLongitude().asRadians()
+        centerDec = skyCenter.getLatitude().asRadians()
+        # The fixed config padding alone cannot bound the linearization error of an
+        # arbitrary (e.g. strongly distorted) Wcs over a full box, so measure the
+        # actual deviation |linearized - true| at the box corners and edge midpoints
+        # -- where the error of a smooth distortion peaks -- and widen the padding
+        # to cover twice the worst sampled case.  This keeps the vectorized filter
+        # conservative without an exact per-parent skyToPixel call.
+        corners = boxD.getCorners()
+        samplePoints = list(corners)
+        for i in range(4):
+            p0 = corners[i]
+            p1 = corners[(i + 1) % 4]
+            samplePoints.append(lsst.afw.geom.Point2D(0.5*(p0.getX() + p1.getX()),
+                                                      0.5*(p0.getY() + p1.getY())))
+        maxDeviation = 0.0
+        for point in samplePoints:
+            sky = wcs.pixelToSky(point)
+            sampleDra = sky.getLongitude().asRadians() - centerRa
+            sampleDra = numpy.fmod(sampleDra + 3*numpy.pi, 2*numpy.pi) - numpy.pi
+            sampleDdec = sky.getLatitude().asRadians() - centerDec
+            lx = center.getX() + matrix[0, 0]*sampleDra + matrix[0, 1]*sampleDdec
+            ly = center.getY() + matrix[1, 0]*sampleDra + matrix[1, 1]*sampleDdec
+            deviation = max(abs(lx - point.getX()), abs(ly - point.getY()))
+            if deviation > maxDeviation:
+                maxDeviation = deviation
+        dra = ra - centerRa
+        dra = numpy.fmod(dra + 3*numpy.pi, 2*numpy.pi) - numpy.pi  # wrap to [-pi, pi)
+        ddec = dec - centerDec
+        px = center.getX() + matrix[0, 0]*dra + matrix[0, 1]*ddec
+        py = center.getY() + matrix[1, 0]*dra + matrix[1, 1]*ddec
+        paddedBox = lsst.afw.geom.Box2D(boxD)
+        paddedBox.grow(self.config.linearizationPadding + 2*maxDeviation)
+        inside = ((px >= paddedBox.getMinX()) & (px <= paddedBox.getMaxX())
+                  & (py >= paddedBox.getMinY()) & (py <= paddedBox.getMaxY()))
+        for i in range(firstParent, lastParent):
+            if inside[i - firstParent]:
+                parent = catalog[i]
                 yield parent
-                for child in catalog.getChildren(parent.getId()):
+                first, last = childRanges.get(parent.getId(), (0, 0))
+                for child in catalog[first:last]:
                     yield child
 
 
@@ -187,43 +319,121 @@ class CoaddSrcReferencesTask(BaseReferencesTask):
         BaseReferencesTask.__init__(self, butler=butler, schema=schema, **kwargs)
         if schema is None:
             assert butler is not None, "No butler nor schema provided"
-            schema = butler.get("{}Coadd_{}_schema".format(self.config.coaddName, self.datasetSuffix),
-                                immediate=True).getSchema()
+            key = (self.config.coaddName, self.datasetSuffix)
+            with _schemaCacheLock:
+                schema = _schemaCache.get(key)
+                if schema is None:
+                    schema = butler.get(
+                        "{}Coadd_{}_schema".format(self.config.coaddName, self.datasetSuffix),
+                        immediate=True).getSchema()
+                    _schemaCache[key] = schema
         self.schema = schema
 
+    def _getSkyMap(self, dataRef):
+        """Return the coadd skyMap for the given dataRef, loading it through the per-butler cache.
+        """
+        butler = dataRef.butlerSubset.butler
+        key = (id(butler), self.config.coaddName)
+        with _skyMapCacheLock:
+            entry = _skyMapCache.get(key)
+            if entry is None or entry[0] is not butler:
+                skyMap = dataRef.get(self.config.coaddName + "Coadd_skyMap", immediate=True)
+                _skyMapCache[key] = (butler, skyMap)
+            else:
+                skyMap = entry[1]
+        return skyMap
+
     def getWcs(self, dataRef):
         """Return the WCS for reference sources.  The given dataRef must include the tract in its dataId.
         """
-        skyMap = dataRef.get(self.config.coaddName + "Coadd_skyMap", immediate=True)
+        skyMap = self._getSkyMap(dataRef)
         return skyMap[dataRef.dataId["tract"]].getWcs()
 
-    def fetchInPatches(self, dataRef, patchList):
+    def fetchInPatches(self, dataRef, patchList, tractBBox=None):
         """!
         An implementation of BaseReferencesTask.fetchInPatches that loads 'coadd_' + datasetSuffix
         catalogs using the butler.
 
         The given dataRef must include the tract in its dataId.
+
+        @param[in] tractBBox  optional Box2D in tract pixel coordinates; patches that cannot
+                              contribute any sources within it are skipped without being read.
+        """
+        for catalog in self._fetchInPatchCatalogs(dataRef, patchList, tractBBox=tractBBox):
+            for source in catalog:
+                yield source
+
+    def _fetchInPatchCatalogs(self, dataRef, patchList, tractBBox=None):
+        """!
+        Return a list of SourceCatalogs, one per patch, already filtered to each patch's
+        inner bounding box if config.removePatchOverlaps is set.
+
+        This is the workhorse behind fetchInPatches; returning whole catalogs lets callers
+        assemble the result with bulk extend calls rather than per-record generator hops.
         """
         dataset = "{}Coadd_{}".format(self.config.coaddName, self.datasetSuffix)
         tract = dataRef.dataId["tract"]
         butler = dataRef.butlerSubset.butler
-        for patch in patchList:
-            dataId = {'tract': tract, 'patch': "%d,%d" % patch.getIndex()}
-            if self.config.filter is not None:
-                dataId['filter'] = self.config.filter
 
-            if not butler.datasetExists(dataset, dataId):
-                raise lsst.pipe.base.TaskError("Reference %s doesn't exist" % (dataId,))
+        if tractBBox is not None:
+            # Skip patches that cannot contribute: findPatchList selects on the outer
+            # bbox, but with removePatchOverlaps only sources in the inner bbox survive,
+            # so a patch whose inner bbox misses the region entirely need not be read.
+            def mightContribute(patch):
+                box = (patch.getInnerBBox() if self.config.removePatchOverlaps
+                       else patch.getOuterBBox())
+                return lsst.afw.geom.Box2D(box).overlaps(tractBBox)
+            patchList = [patch for patch in patchList if mightContribute(patch)]
+
+        baseDataId = {'tract': tract}
+        if self.config.filter is not None:
+            baseDataId['filter'] = self.config.filter
+
+        def getPatchCatalog(patch):
+            # Copy rather than mutate baseDataId: getPatchCatalog may run in threads.
+            dataId = baseDataId.copy()
+            dataId['patch'] = _patchIndexStr(patch.getIndex())
+
             self.log.info("Getting references in %s" % (dataId,))
-            catalog = butler.get(dataset, dataId, immediate=True)
+            # A failed get costs no more than the datasetExists check it replaces,
+            # and the common (existing) case does a single registry lookup.
+            try:
+                return butler.get(dataset, dataId, immediate=True)
+            except NoResults:
+                raise lsst.pipe.base.TaskError("Reference %s doesn't exist" % (dataId,))
+
+        # Overlap the per-patch reads (dominated by I/O latency) with a thread
+        # pool when one is requested and available; order is preserved.
+        catalogs = None
+        numThreads = min(self.config.numPatchThreads, len(patchList))
+        if ThreadPoolExecutor is not None and numThreads > 1:
+            executor = ThreadPoolExecutor(max_workers=numThreads)
+            try:
+                catalogs = list(executor.map(getPatchCatalog, patchList))
+            finally:
+                executor.shutdown()
+
+        result = []
+        for i, patch in enumerate(patchList):
+            catalog = catalogs[i] if catalogs is not None else getPatchCatalog(patch)
             if self.config.removePatchOverlaps:
                 bbox = lsst.afw.geom.Box2D(patch.getInnerBBox())
-                for source in catalog:
-                    if bbox.contains(source.getCentroid()):
-                        yield source
-            else:
-                for source in catalog:
-                    yield source
+                try:
+                    # Filter on the centroid slot columns in one vectorized pass;
+                    # this requires the catalog to be contiguous in memory.
+                    x = catalog.getX()
+                    y = catalog.getY()
+                except Exception:
+                    subCatalog = lsst.afw.table.SourceCatalog(catalog.table)
+                    subCatalog.extend(source for source in catalog
+                                      if bbox.contains(source.getCentroid()))
+                    catalog = subCatalog
+                else:
+                    inside = ((x >= bbox.getMinX()) & (x <= bbox.getMaxX())
+                              & (y >= bbox.getMinY()) & (y <= bbox.getMaxY()))
+                    catalog = catalog[inside]
+            result.append(catalog)
+        return result
 
     def fetchInBox(self, dataRef, bbox, wcs, pad=0):
         """!
@@ -238,7 +448,7 @@ class CoaddSrcReferencesTask(BaseReferencesTask):
 
         @return an iterable of reference sources
         """
-        skyMap = dataRef.get(self.config.coaddName + "Coadd_skyMap", immediate=True)
+        skyMap = self._getSkyMap(dataRef)
         tract = skyMap[dataRef.dataId["tract"]]
         coordList = [wcs.pixelToSky(corner) for corner in lsst.afw.geom.Box2D(bbox).getCorners()]
         self.log.info("Getting references in region with corners %s [degrees]" %
@@ -248,7 +458,26 @@ class CoaddSrcReferencesTask(BaseReferencesTask):
         # But don't add any new patches while padding
         if pad:
             bbox.grow(pad)
-        return self.subset(self.fetchInPatches(dataRef, patchList), bbox, wcs)
+        # Give the patch fetch the region of interest in tract pixels, so patches that
+        # cannot contribute (selected only via their outer bbox) are skipped unread.
+        # This must use the corners of the *padded* box -- subset filters against the
+        # padded box, so pruning on the unpadded one would silently drop sources in
+        # the pad ring -- and the 4-corner hull only approximates the curved sky
+        # region, so grow the result by a safety margin; a looser box just means a
+        # patch is read unnecessarily, never that sources are lost.
+        tractWcs = tract.getWcs()
+        tractBBox = lsst.afw.geom.Box2D()
+        for corner in lsst.afw.geom.Box2D(bbox).getCorners():
+            tractBBox.include(tractWcs.skyToPixel(wcs.pixelToSky(corner)))
+        tractBBox.grow(_TRACT_BBOX_MARGIN)
+        # Concatenate the per-patch catalogs with bulk (shallow) extends rather than
+        # funnelling every record through a generator; subset makes its own deep copy.
+        refCat = lsst.afw.table.SourceCatalog(self.schema)
+        catalogs = self._fetchInPatchCatalogs(dataRef, patchList, tractBBox=tractBBox)
+        refCat.reserve(sum(len(catalog) for catalog in catalogs))
+        for catalog in catalogs:
+            refCat.extend(catalog, deep=False)
+        return self.subset(refCat, bbox, wcs)
 
 
 class MultiBandReferencesConfig(CoaddSrcReferencesTask.ConfigClass):
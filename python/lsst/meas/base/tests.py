@@ -459,6 +459,44 @@ class TestDataset(object):
         return exposure, catalog
 
 
+_sharedDatasetCache = {}
+
+def makeSharedDataset(bbox, flux, centroid):
+    """!
+    Return a TestDataset for the given bbox with a single source of the given flux and
+    centroid, memoized on those parameters.
+
+    Building a TestDataset (image simulation, PSF convolution, footprint construction)
+    is expensive, and many test cases use identical single-source datasets in setUp;
+    this factory lets them share one instance across test methods and modules.  The
+    returned dataset must be treated as read-only: call realize()/transform() on it,
+    but do not addSource() or otherwise mutate it.  Note that realize() does not
+    copy the Footprints of parent records, so catalogs realized from a shared
+    dataset share those Footprints with it; tests that mutate footprints or their
+    peaks must build a private TestDataset instead.
+    """
+    key = (bbox.getMinX(), bbox.getMinY(), bbox.getMaxX(), bbox.getMaxY(),
+           float(flux), float(centroid.getX()), float(centroid.getY()))
+    dataset = _sharedDatasetCache.get(key)
+    if dataset is None:
+        dataset = TestDataset(lsst.afw.geom.Box2I(bbox))
+        dataset.addSource(flux, centroid)
+        _sharedDatasetCache[key] = dataset
+    return dataset
+
+
+def clearSharedDatasets():
+    """!
+    Drop all datasets cached by makeSharedDataset.
+
+    Each cached TestDataset holds an exposure, schema, and catalog, which count as
+    live Citizens in lsst.utils.tests.MemoryTestCase's leak census; test classes
+    that use makeSharedDataset should call this from tearDownClass so the cache is
+    empty by the time MemoryTestCase (appended last to every suite) runs.
+    """
+    _sharedDatasetCache.clear()
+
+
 class AlgorithmTestCase(lsst.utils.tests.TestCase):
     # Some tests depend on the noise realization in the test data or from the
     # numpy random number generator. In most cases, they are testing that the
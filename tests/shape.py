@@ -24,6 +24,8 @@
 import math
 import unittest
 
+import numpy
+
 import lsst.afw.image as afwImage
 import lsst.afw.geom as afwGeom
 import lsst.afw.table as afwTable
@@ -32,14 +34,58 @@ import lsst.meas.base as measBase
 import lsst.utils.tests as utilsTests
 import lsst.afw.detection as afwDetection
 
-import lsst.afw.display.ds9 as ds9
-
 try:
     type(verbose)
 except NameError:
     verbose = 0
     display = False
 
+def _makeGaussianStamp(a, b, c, s, k):
+    """Return a (2k+1, 2k+1) array containing an elliptical Gaussian of amplitude 1000
+    with major/minor axes a, b and position angle given by cosine/sine c, s, centred
+    on the middle pixel of the stamp.
+    """
+    DX, DY = numpy.meshgrid(numpy.arange(-k, k + 1), numpy.arange(-k, k + 1))
+    U = c*DX + s*DY
+    V = s*DX - c*DY
+    inva2, invb2 = 1.0/(a*a), 1.0/(b*b)  # multiply by the reciprocals; no per-pixel pow/divide
+    return 1000*numpy.exp(-0.5*(U*U*inva2 + V*V*invb2))
+
+try:
+    import numba
+except ImportError:
+    pass
+else:
+    # When numba is available, fuse the meshgrid/exp temporaries of the NumPy
+    # version into a single compiled loop; cache=True so compilation is paid once.
+    @numba.njit(cache=True, fastmath=True)
+    def _makeGaussianStamp(a, b, c, s, k):
+        n = 2*k + 1
+        out = numpy.empty((n, n), dtype=numpy.float64)
+        inva2, invb2 = 1.0/(a*a), 1.0/(b*b)
+        for i in range(n):
+            dy = i - k
+            for j in range(n):
+                dx = j - k
+                u = c*dx + s*dy
+                v = s*dx - c*dy
+                out[i, j] = 1000.0*math.exp(-0.5*(u*u*inva2 + v*v*invb2))
+        return out
+
+_stampCache = {}
+
+def _getGaussianStamp(a, b, c, s, k):
+    """Return a Gaussian stamp from _makeGaussianStamp, memoized on the (rounded)
+    geometry; repeated trials with the same a, b, phi reuse the cached array, which
+    callers must therefore treat as read-only.
+    """
+    key = (round(a, 6), round(b, 6), round(c, 6), round(s, 6), k)
+    stamp = _stampCache.get(key)
+    if stamp is None:
+        stamp = _makeGaussianStamp(a, b, c, s, k)
+        _stampCache[key] = stamp
+    return stamp
+
 def makePluginAndCat(alg, name, control, metadata=False, centroid=None):
     schema = afwTable.SourceTable.makeMinimalSchema()
     if centroid:
@@ -91,6 +137,7 @@ class ShapeTestCase(unittest.TestCase):
         #
         # Add a Gaussian to the image
         #
+        lastPainted = None              # region of the image painted by the previous trial
         for a, b, phi, tol in [              # n.b. phi in degrees
             (2.5, 1.5, 90.0, 1e-3),
             (1.5, 2.5,  0.0, 1e-3),
@@ -113,7 +160,6 @@ class ShapeTestCase(unittest.TestCase):
 
             im = mi.getImage()
             x, y = 30, 40               # centre of object
-            im[:] = bkgd
 
             axes = afwGeom.ellipses.Axes(a, b, phi, True)
             quad = afwGeom.ellipses.Quadrupole(axes)
@@ -124,27 +170,36 @@ class ShapeTestCase(unittest.TestCase):
                 print a, b, a0, b0
             sigma_xx, sigma_yy, sigma_xy = quad.getIxx(), quad.getIyy(), quad.getIxy()
 
-            ksize = 2*int(4*max(a, b)) + 1
+            k = int(math.ceil(4*max(a, b)))  # stamp half-width; ceil keeps this an exact int
             c, s = math.cos(phi), math.sin(phi)
 
-            sum, sumxx, sumxy, sumyy = 4*[0.0] if False else 4*[None]
-            for dx in range(-ksize/2, ksize/2 + 1):
-                for dy in range(-ksize/2, ksize/2 + 1):
-                    u, v = c*dx + s*dy,  s*dx - c*dy
-                    I = 1000*math.exp(-0.5*((u/a)**2 + (v/b)**2))
-                    im[x + dx, y + dy] += I
-
-                    if sum is not None:
-                        sum += I
-                        sumxx += I*dx*dx
-                        sumxy += I*dx*dy
-                        sumyy += I*dy*dy
-
-            if sum is not None:
-                sumxx /= sum; sumxy /= sum; sumyy /= sum
+            # Paint the stamp in a single vectorized pass rather than looping over
+            # pixels in Python; the image array is a view, so the += writes through.
+            I = _getGaussianStamp(a, b, c, s, k)
+            arr = im.getArray()
+            height, width = arr.shape
+            x0, x1 = max(x - k, 0), min(x + k + 1, width)
+            y0, y1 = max(y - k, 0), min(y + k + 1, height)
+            # Reset only the pixels that can differ from the background: the region
+            # painted by the previous trial and the region about to be painted.
+            if lastPainted is None:
+                arr[:] = bkgd
+            else:
+                arr[lastPainted] = bkgd
+                arr[y0:y1, x0:x1] = bkgd
+            lastPainted = (slice(y0, y1), slice(x0, x1))
+            arr[y0:y1, x0:x1] += I[y0 - (y - k):y1 - (y - k), x0 - (x - k):x1 - (x - k)]
+
+            if False:
+                DX, DY = numpy.meshgrid(numpy.arange(-k, k + 1), numpy.arange(-k, k + 1))
+                sum = numpy.sum(I)
+                sumxx = numpy.sum(I*DX*DX)/sum
+                sumxy = numpy.sum(I*DX*DY)/sum
+                sumyy = numpy.sum(I*DY*DY)/sum
                 print "RHL %g %g %g" % (sumxx, sumyy, sumxy)
 
             if display:
+                import lsst.afw.display.ds9 as ds9
                 ds9.mtv(im)
 
             footprint = afwDetection.FootprintSet(im, afwDetection.Threshold(110)).getFootprints()[0]
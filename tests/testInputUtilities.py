@@ -31,17 +31,42 @@ import lsst.utils.tests
 import lsst.pex.exceptions
 
 
+_taskCache = {}
+
+def _getMeasurementTask(testCase, plugin, dependencies, centroid, shape):
+    """Return a SingleFrameMeasurementTask for the given plugin/slot combination,
+    cached on those parameters.
+
+    Task construction (plugin registry lookups plus schema building) is expensive
+    and the alias tests only inspect the resulting schema, so successfully built
+    tasks can be shared.  The failure-path tests build their configs directly,
+    since construction itself is what they exercise.
+    """
+    key = (plugin, dependencies, centroid, shape)
+    task = _taskCache.get(key)
+    if task is None:
+        config = testCase.makeSingleFrameMeasurementConfig(plugin, dependencies)
+        config.slots.centroid = centroid
+        config.slots.shape = shape
+        task = testCase.makeSingleFrameMeasurementTask(config=config)
+        _taskCache[key] = task
+    return task
+
+
 class InputUtilitiesTestCase(lsst.meas.base.tests.AlgorithmTestCase):
 
+    @classmethod
+    def tearDownClass(cls):
+        # the cached tasks hold schemas and metadata PropertyLists (Citizens);
+        # clear them before MemoryTestCase runs its leak census
+        _taskCache.clear()
+
     def testFlagAliases(self):
         """Test that we get flag aliases to the slot centroid and shape algorithms when we
         initialize GaussianFlux (which uses both SafeCentroidExtractor and SafeShapeExtractor).
         """
-        config = self.makeSingleFrameMeasurementConfig("base_GaussianFlux",
-                                                       ["base_SdssCentroid", "base_SdssShape"])
-        config.slots.centroid = "base_SdssCentroid"
-        config.slots.shape = "base_SdssShape"
-        task = self.makeSingleFrameMeasurementTask(config=config)
+        task = _getMeasurementTask(self, "base_GaussianFlux", ("base_SdssCentroid", "base_SdssShape"),
+                                   centroid="base_SdssCentroid", shape="base_SdssShape")
         # Test that the aliases resolve to the correct field.
         self.assertEqual(task.schema.find("base_GaussianFlux_flag_badCentroid").key,
                          task.schema.find("base_SdssCentroid_flag").key)
@@ -56,10 +81,8 @@ class InputUtilitiesTestCase(lsst.meas.base.tests.AlgorithmTestCase):
     def testCentroidFlagAliases(self):
         """Test that we setup the right aliases when using centroid algorithms to feed each other.
         """
-        config = self.makeSingleFrameMeasurementConfig("base_NaiveCentroid", ["base_SdssCentroid"])
-        config.slots.centroid = "base_SdssCentroid"
-        config.slots.shape = None
-        task = self.makeSingleFrameMeasurementTask(config=config)
+        task = _getMeasurementTask(self, "base_NaiveCentroid", ("base_SdssCentroid",),
+                                   centroid="base_SdssCentroid", shape=None)
         # Test that the alias resolves to the correct field.
         self.assertEqual(task.schema.find("base_NaiveCentroid_flag_badInitialCentroid").key,
                          task.schema.find("base_SdssCentroid_flag").key)
@@ -49,20 +49,38 @@ def onlyLogFatal(log):
 
 
 class SingleFramePeakCentroidTestCase(AlgorithmTestCase):
+
+    task = None
+
+    @classmethod
+    def setUpClass(cls):
+        super(SingleFramePeakCentroidTestCase, cls).setUpClass()
+        cls.center = lsst.afw.geom.Point2D(50.1, 49.8)
+        cls.bbox = lsst.afw.geom.Box2I(lsst.afw.geom.Point2I(-20, -30),
+                                       lsst.afw.geom.Extent2I(140, 160))
+        # shared read-only dataset; built once and reused across test methods
+        cls.dataset = lsst.meas.base.tests.makeSharedDataset(cls.bbox, 1000000.0, cls.center)
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.center
+        del cls.bbox
+        del cls.dataset
+        cls.task = None
+        # the shared dataset holds Citizens; clear the cache before
+        # MemoryTestCase runs its leak census
+        lsst.meas.base.tests.clearSharedDatasets()
+
     def setUp(self):
-        self.center = lsst.afw.geom.Point2D(50.1, 49.8)
-        self.bbox = lsst.afw.geom.Box2I(lsst.afw.geom.Point2I(-20, -30),
-                                        lsst.afw.geom.Extent2I(140, 160))
-        self.dataset = lsst.meas.base.tests.TestDataset(self.bbox)
-        self.dataset.addSource(1000000.0, self.center)
-        self.task = self.makeSingleFrameMeasurementTask("base_PeakCentroid")
-        self.exposure, self.catalog = self.dataset.realize(10.0, self.task.schema)
+        cls = type(self)
+        if cls.task is None:
+            # the task is stateless between run() calls and expensive to build
+            # (plugin registry lookup plus schema construction), so one instance
+            # serves every test in the class
+            cls.task = self.makeSingleFrameMeasurementTask("base_PeakCentroid")
+        self.exposure, self.catalog = self.dataset.realize(10.0, cls.task.schema)
 
     def tearDown(self):
-        del self.center
-        del self.bbox
-        del self.dataset
-        del self.task
         del self.exposure
         del self.catalog
 
@@ -83,11 +101,18 @@ class SingleFramePeakCentroidTestCase(AlgorithmTestCase):
         we have removed the Peaks from the SourceRecord -- the centroider
         should set a failure flag.
         """
-        self.catalog[0].getFootprint().getPeaks().clear()
+        # realize() hands out catalogs whose parent records share their Footprint
+        # with the underlying dataset, so clearing the peaks on a realization of
+        # the shared dataset would corrupt it for every later test; build a
+        # private dataset for this mutation instead.
+        dataset = lsst.meas.base.tests.TestDataset(self.bbox)
+        dataset.addSource(1000000.0, self.center)
+        exposure, catalog = dataset.realize(10.0, self.task.schema)
+        catalog[0].getFootprint().getPeaks().clear()
         # The decorator suppresses alarming but expected errors on the console.
         with onlyLogFatal(self.task.log):
-            self.task.run(self.exposure, self.catalog)
-        self.assertTrue(self.catalog[0].get("base_PeakCentroid_flag"))
+            self.task.run(exposure, catalog)
+        self.assertTrue(catalog[0].get("base_PeakCentroid_flag"))
 
 
 class SingleFramePeakCentroidTransformTestCase(CentroidTransformTestCase,
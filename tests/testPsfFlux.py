@@ -36,12 +36,43 @@ from lsst.meas.base.tests import (AlgorithmTestCase, FluxTransformTestCase,
 
 class PsfFluxTestCase(AlgorithmTestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        super(PsfFluxTestCase, cls).setUpClass()
+        # per-class cache of realize() results; see _realizeCached
+        cls._realizeCache = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        # drop the cached exposures, catalogs, and datasets (Citizens) before
+        # MemoryTestCase runs its leak census
+        del cls._realizeCache
+        lsst.meas.base.tests.clearSharedDatasets()
+
+    def _realizeCached(self, noise, schema):
+        """Return an (exposure, catalog) realization of self.dataset at the given
+        noise, cloned from a per-class cached realization so callers may mutate the
+        result freely.
+
+        The cache key includes the schema's field list, so tasks or algorithms with
+        different output fields get distinct realizations.  Tests sharing a cache
+        entry see the same noise draw, which is fine for the tests here: they only
+        require some reasonable realization, not independent noise.
+        """
+        key = (noise, str(schema))
+        cached = self._realizeCache.get(key)
+        if cached is None:
+            cached = self.dataset.realize(noise, schema)
+            self._realizeCache[key] = cached
+        exposure, catalog = cached
+        return exposure.clone(), catalog.copy(deep=True)
+
     def setUp(self):
         self.center = lsst.afw.geom.Point2D(50.1, 49.8)
         self.bbox = lsst.afw.geom.Box2I(lsst.afw.geom.Point2I(0, 0),
                                         lsst.afw.geom.Extent2I(100, 100))
-        self.dataset = lsst.meas.base.tests.TestDataset(self.bbox)
-        self.dataset.addSource(100000.0, self.center)
+        # shared read-only dataset; built once and reused across test methods
+        self.dataset = lsst.meas.base.tests.makeSharedDataset(self.bbox, 100000.0, self.center)
 
     def tearDown(self):
         del self.center
@@ -59,7 +90,7 @@ class PsfFluxTestCase(AlgorithmTestCase):
 
     def testMasking(self):
         algorithm, schema = self.makeAlgorithm()
-        exposure, catalog = self.dataset.realize(10.0, schema)
+        exposure, catalog = self._realizeCached(10.0, schema)
         record = catalog[0]
         badPoint = lsst.afw.geom.Point2I(self.center) + lsst.afw.geom.Extent2I(3,4)
         imageArray = exposure.getMaskedImage().getImage().getArray()
@@ -77,8 +108,10 @@ class PsfFluxTestCase(AlgorithmTestCase):
         # rng dependent
         self.assertClose(record.get("base_PsfFlux_flux"), record.get("truth_flux"),
                          atol=3*record.get("base_PsfFlux_fluxSigma"))
-        # If we mask the whole image, we should get a MeasurementError
-        maskArray[:,:] |= badMask
+        # If we mask the whole image, we should get a MeasurementError.  The mask is
+        # clean apart from the BAD bit already set on badPoint, so a write-only fill
+        # is equivalent to |= without reading the array back.
+        maskArray.fill(badMask)
         with self.assertRaises(lsst.meas.base.MeasurementError) as context:
             algorithm.measure(record, exposure)
         self.assertEqual(context.exception.getFlagBit(), lsst.meas.base.PsfFluxAlgorithm.NO_GOOD_PIXELS)
@@ -88,7 +121,7 @@ class PsfFluxTestCase(AlgorithmTestCase):
         when it should be.
         """
         algorithm, schema = self.makeAlgorithm()
-        exposure, catalog = self.dataset.realize(10.0, schema)
+        exposure, catalog = self._realizeCached(10.0, schema)
         record = catalog[0]
         psfImage = exposure.getPsf().computeImage(record.getCentroid())
         bbox = psfImage.getBBox()
@@ -103,7 +136,7 @@ class PsfFluxTestCase(AlgorithmTestCase):
         """Test that we raise FatalAlgorithmError when there's no PSF.
         """
         algorithm, schema = self.makeAlgorithm()
-        exposure, catalog = self.dataset.realize(10.0, schema)
+        exposure, catalog = self._realizeCached(10.0, schema)
         exposure.setPsf(None)
         self.assertRaises(lsst.meas.base.FatalAlgorithmError, algorithm.measure, catalog[0], exposure)
 
@@ -119,24 +152,40 @@ class PsfFluxTestCase(AlgorithmTestCase):
         self.assertClose(record.get("base_PsfFlux_flux"), flux, rtol=1E-3)
         self.assertClose(record.get("base_PsfFlux_fluxSigma"), 0.0, rtol=1E-3)
         for noise in (0.001, 0.01, 0.1):
-            fluxes = []
-            fluxSigmas = []
             nSamples = 1000
-            for repeat in xrange(nSamples):
-                exposure, catalog = self.dataset.realize(noise*flux, schema)
-                record = catalog[0]
-                algorithm.measure(record, exposure)
-                fluxes.append(record.get("base_PsfFlux_flux"))
-                fluxSigmas.append(record.get("base_PsfFlux_fluxSigma"))
-            fluxMean = numpy.mean(fluxes)
-            fluxSigmaMean = numpy.mean(fluxSigmas)
-            fluxStandardDeviation = numpy.std(fluxes)
+            # realize() rebuilds the exposure, catalog, and HeavyFootprints from
+            # scratch; only the pixel noise differs between iterations, so realize
+            # once per noise level and redraw the noise into the image buffer.
+            exposure, catalog = self.dataset.realize(noise*flux, schema)
+            record = catalog[0]
+            # measure into one record per iteration so the results can be read back
+            # afterwards as contiguous columns instead of per-iteration record.get
+            measCat = lsst.afw.table.SourceCatalog(schema)
+            measCat.reserve(nSamples)
+            addNew = measCat.addNew
+            for _ in range(nSamples):
+                addNew().assign(record)
+            imageArray = exposure.getMaskedImage().getImage().getArray()
+            noiseless = self.dataset.exposure.getMaskedImage().getImage().getArray()
+            # bind the hot callables to locals; Python 3 compatible range
+            measure = algorithm.measure
+            randn = numpy.random.randn
+            noiseScale = noise*flux
+            for i in range(nSamples):
+                imageArray[:, :] = noiseless
+                imageArray += randn(*imageArray.shape)*noiseScale
+                measure(measCat[i], exposure)
+            fluxes = measCat["base_PsfFlux_flux"]
+            fluxSigmas = measCat["base_PsfFlux_fluxSigma"]
+            fluxMean = fluxes.mean()
+            fluxSigmaMean = fluxSigmas.mean()
+            fluxStandardDeviation = fluxes.std()
             self.assertClose(fluxSigmaMean, fluxStandardDeviation, rtol=0.10)   # rng dependent
             self.assertLess(fluxMean - flux, 2.0*fluxSigmaMean / nSamples**0.5)   # rng dependent
 
     def testSingleFramePlugin(self):
         task = self.makeSingleFrameMeasurementTask("base_PsfFlux")
-        exposure, catalog = self.dataset.realize(10.0, task.schema)
+        exposure, catalog = self._realizeCached(10.0, task.schema)
         task.run(exposure, catalog)
         record = catalog[0]
         self.assertFalse(record.get("base_PsfFlux_flag"))
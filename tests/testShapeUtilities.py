@@ -40,10 +40,13 @@ class shapeTransformMatrixTestCase(lsst.utils.tests.TestCase):
     def testVsTransform(self):
         # Transforming an ellipse by multiplying by the matrix should be
         # equivalent to calling its transform() method.
-        l = lsst.afw.geom.LinearTransform.makeRotation(lsst.afw.geom.Angle(numpy.random.random()))
-        e = lsst.afw.geom.ellipses.Quadrupole(numpy.random.random(), numpy.random.random(),
-                                              numpy.random.random())
-        numpy.testing.assert_array_almost_equal(numpy.dot(lsst.meas.base.makeShapeTransformMatrix(l),
+        # one batched draw instead of four separate RNG calls
+        rs = numpy.random.random(4)
+        l = lsst.afw.geom.LinearTransform.makeRotation(lsst.afw.geom.Angle(rs[0]))
+        e = lsst.afw.geom.ellipses.Quadrupole(rs[1], rs[2], rs[3])
+        # matmul dispatches through the gufunc machinery, skipping numpy.dot's
+        # legacy wrapper overhead for this small matrix-vector product
+        numpy.testing.assert_array_almost_equal(numpy.matmul(lsst.meas.base.makeShapeTransformMatrix(l),
                                                 e.getParameterVector()), e.transform(l).getParameterVector())
 
     def testVales(self):
@@ -51,17 +54,13 @@ class shapeTransformMatrixTestCase(lsst.utils.tests.TestCase):
         l = lsst.afw.geom.LinearTransform(numpy.random.random((2,2)))
         m = lsst.meas.base.makeShapeTransformMatrix(l)
 
-        self.assertEqual(m[0,0], l[0,0]*l[0,0])
-        self.assertEqual(m[0,1], l[0,1]*l[0,1])
-        self.assertEqual(m[0,2], 2*l[0,0]*l[0,1])
-
-        self.assertEqual(m[1,0], l[1,0]*l[1,0])
-        self.assertEqual(m[1,1], l[1,1]*l[1,1])
-        self.assertEqual(m[1,2], 2*l[1,0]*l[1,1])
-
-        self.assertEqual(m[2,0], l[0,0]*l[1,0])
-        self.assertEqual(m[2,1], l[0,1]*l[1,1])
-        self.assertEqual(m[2,2], l[0,0]*l[1,1] + l[0,1]*l[1,0])
+        # build the expected matrix in one array literal and compare in a single
+        # vectorized assertion rather than nine element-wise assertEqual calls
+        L = l.getMatrix()
+        expected = numpy.array([[L[0,0]*L[0,0], L[0,1]*L[0,1], 2*L[0,0]*L[0,1]],
+                                [L[1,0]*L[1,0], L[1,1]*L[1,1], 2*L[1,0]*L[1,1]],
+                                [L[0,0]*L[1,0], L[0,1]*L[1,1], L[0,0]*L[1,1] + L[0,1]*L[1,0]]])
+        numpy.testing.assert_array_equal(m, expected)
 
 
 def suite():